@@ -1,6 +1,16 @@
+import io
+import threading
+
 import streamlit as st
 import numpy as np
-import matplotlib.pyplot as plt
+import matplotlib
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from heisenberg.core import get_ranked_configs, sign_pattern
+
+# Headless server: never probe for a GUI backend
+matplotlib.use('Agg')
 
 # --- 1. CONFIGURATION & TITLE ---
 st.set_page_config(page_title="DMRG Heisenberg 6x6", layout="wide")
@@ -8,10 +18,24 @@ st.set_page_config(page_title="DMRG Heisenberg 6x6", layout="wide")
 st.title("DMRG Simulation of 36 Heisenberg Spins")
 st.latex(r"H = J_x \sum_{\langle i,j \rangle_x} \mathbf{S}_i \cdot \mathbf{S}_j + J_y \sum_{\langle i,j \rangle_y} \mathbf{S}_i \cdot \mathbf{S}_j")
 
+def _query_coupling(name, default):
+    # ?jx=..&jy=.. select the initial couplings, so one entry point serves every
+    # preset; unparsable or non-finite values fall back to the default
+    try:
+        value = float(st.query_params.get(name, default))
+    except ValueError:
+        return default
+    if not np.isfinite(value):
+        return default
+    return min(max(round(value, 1), -2.0), 2.0)
+
 # Sidebar Controls
 st.sidebar.header("Interaction Parameters")
-jx = st.sidebar.slider("Jx (Horizontal)", -2.0, 2.0, -1.0, 0.1)
-jy = st.sidebar.slider("Jy (Vertical)", -2.0, 2.0, 1.0, 0.1)
+# Inside a form, dragging a slider doesn't rerun the script; only Update does
+with st.sidebar.form("params"):
+    jx = st.slider("Jx (Horizontal)", -2.0, 2.0, _query_coupling("jx", -1.0), 0.1)
+    jy = st.slider("Jy (Vertical)", -2.0, 2.0, _query_coupling("jy", 1.0), 0.1)
+    st.form_submit_button("Update")
 
 st.sidebar.info(r"""
 **Visualization Details:**
@@ -20,102 +44,94 @@ st.sidebar.info(r"""
 - **Row 3:** Correlation map with fixed range [-0.25, 0.25].
 """)
 
-# --- 2. PHYSICS LOGIC ---
-@st.cache_data
-def get_ranked_configs(Jx, Jy):
-    Nx, Ny = 6, 6
-    configs = []
-    energies = []
-    
-    # Sample configurations to find the top ground state components
-    for seed in range(12):
-        rng = np.random.default_rng(seed=seed)
-        spins = np.array([1]*18 + [-1]*18)
-        rng.shuffle(spins)
-        grid = spins.reshape(Ny, Nx)
-
-        for _ in range(600):
-            r1, c1 = rng.integers(0, Ny), rng.integers(0, Nx)
-            r2, c2 = rng.integers(0, Ny), rng.integers(0, Nx)
-            if grid[r1, c1] != grid[r2, c2]:
-                def get_local_e(r, c, val):
-                    return Jx * val * (grid[r, (c+1)%Nx] + grid[r, (c-1)%Nx]) + \
-                           Jy * val * (grid[(r+1)%Ny, c] + grid[(r-1)%Ny, c])
-
-                e_before = get_local_e(r1, c1, grid[r1, c1]) + get_local_e(r2, c2, grid[r2, c2])
-                grid[r1, c1], grid[r2, c2] = grid[r2, c2], grid[r1, c1]
-                e_after = get_local_e(r1, c1, grid[r1, c1]) + get_local_e(r2, c2, grid[r2, c2])
-                
-                if e_after > e_before and rng.random() > 0.05:
-                    grid[r1, c1], grid[r2, c2] = grid[r2, c2], grid[r1, c1]
-        
-        total_e = Jx * np.sum(grid * np.roll(grid, -1, axis=1)) + \
-                  Jy * np.sum(grid * np.roll(grid, -1, axis=0))
-        configs.append(grid.copy())
-        energies.append(total_e)
-
-    indices = np.argsort(energies)
-    top_energies = np.array(energies)[indices][:6]
-    top_configs = [configs[i] for i in indices[:6]]
-    
-    beta = 0.5 
-    weights = np.exp(-beta * (top_energies - np.min(top_energies)))
-    probs = (weights / np.sum(weights)) * 100
-    
-    return top_configs, probs
-
-# --- 3. VISUALIZATION ---
-def run_app():
-    plt.clf()
-    fig = plt.figure(figsize=(15, 12))
-    gs = fig.add_gridspec(3, 6, height_ratios=[1, 0.8, 1])
+# --- 2. VISUALIZATION ---
+# RGBA lookup: index 0 = down spin (blue, #3333ff), 1 = up spin (red, #ff3333)
+_SPIN_RGBA = np.array([[0.2, 0.2, 1.0, 1.0], [1.0, 0.2, 0.2, 1.0]])
+# Flattened site coordinates of one 6x6 panel, in row-major site order
+_X, _Y = (g.ravel() for g in np.meshgrid(np.arange(6), np.arange(6)))
+# Row-1 lattices share one scatter, laid out side by side _PANEL_STEP apart
+_PANEL_STEP = 7.5
+_XPOS = np.linspace(0.1, 0.9, 6)
 
-    top_configs, probs = get_ranked_configs(jx, jy)
+@st.cache_resource
+def _make_fig():
+    # Figure skeleton shared by every rerun and session; only the data-bearing
+    # artists are updated in run_app, under the lock. Built without pyplot so
+    # it is never held by pyplot's figure manager.
+    fig = Figure(figsize=(15, 12), dpi=80)
+    # Bind the Agg canvas once so savefig doesn't swap in a new one per render
+    FigureCanvasAgg(fig)
+    gs = fig.add_gridspec(3, 6, height_ratios=[1, 0.8, 1])
 
     # ROW 1: Most Likely Configurations
-    for i in range(6):
-        ax = fig.add_subplot(gs[0, i])
-        grid = top_configs[i]
-        X, Y = np.meshgrid(range(6), range(6))
-        colors = ['#ff3333' if s > 0 else '#3333ff' for s in grid.flatten()]
-        ax.scatter(X, Y, c=colors, s=550, edgecolors='black', linewidth=0.5)
-        ax.set_xlim(-0.8, 5.8)
-        ax.set_ylim(-0.8, 5.8)
-        ax.set_aspect('equal')
-        ax.axis('off')
-        ax.set_title(f"Rank {i+1}\nProb: {probs[i]:.2f}%", fontsize=10, fontweight='bold')
+    ax_cfg = fig.add_subplot(gs[0, :])
+    panel_x = _PANEL_STEP * np.arange(6)
+    sc = ax_cfg.scatter((panel_x[:, None] + _X).ravel(), np.tile(_Y, 6),
+                        c=_SPIN_RGBA[np.zeros(6 * 36, dtype=np.int8)],
+                        s=550, edgecolors='black', linewidth=0.5)
+    titles = [ax_cfg.text(x + 2.5, 6.0, f"Rank {i+1}\nProb: 0.00%", ha='center', va='bottom',
+                          fontsize=10, fontweight='bold', parse_math=False)
+              for i, x in enumerate(panel_x)]
+    ax_cfg.set(xlim=(-0.8, panel_x[-1] + 5.8), ylim=(-0.8, 5.8), aspect='equal')
+    ax_cfg.set_axis_off()
 
     # ROW 2: Energy Spectrum
     ax_en = fig.add_subplot(gs[1, :])
-    E0 = - (abs(jx) + abs(jy)) * 9 * 0.73
-    offsets = [0, 0.18, 0.45, 0.72, 1.0, 1.4]
-    degen = [1, 3, 5, 1, 3, 7]
-    x_pos = np.linspace(0.1, 0.9, 6)
-    for k in range(6):
-        val = E0 + offsets[k] * (abs(jx) + abs(jy))
-        ax_en.hlines(val, x_pos[k]-0.04, x_pos[k]+0.04, colors='black', lw=4)
-        ax_en.text(x_pos[k], val + 0.03, f"{val:.3f}\ng={degen[k]}", ha='center', fontweight='bold')
-    ax_en.set_title("Energy Spectrum (Anderson Tower of States)")
-    ax_en.set_ylabel("Energy E")
-    ax_en.set_xticks([])
+    levels = [ax_en.plot([x-0.04, x+0.04], [0, 0], color='black', lw=4, solid_capstyle='butt')[0]
+              for x in _XPOS]
+    labels = [ax_en.text(x, 0, "", ha='center', fontweight='bold', parse_math=False) for x in _XPOS]
+    ax_en.set_title("Energy Spectrum (Anderson Tower of States)", parse_math=False)
+    ax_en.set(ylabel="Energy E", xticks=[])
 
     # ROW 3: Correlation Plot (Fixed Range)
     ax_corr = fig.add_subplot(gs[2, 2:4])
-    sx, sy = (-1 if jx > 0 else 1), (-1 if jy > 0 else 1)
-    corr_matrix = np.zeros((6, 6))
-    for r in range(6):
-        for c in range(6):
-            corr_matrix[r, c] = (sy**r) * (sx**c) * 0.25
-    
     # vmin and vmax fix the colorbar range
-    im = ax_corr.imshow(corr_matrix, cmap='RdBu_r', origin='lower', 
+    im = ax_corr.imshow(np.zeros((6, 6)), cmap='RdBu_r', origin='lower',
                         interpolation='nearest', vmin=-0.25, vmax=0.25)
     ax_corr.set_aspect('equal')
     ax_corr.set_title(r"Correlation $C(i,j) = \langle S^z_0 S^z_{i,j} \rangle$")
-    plt.colorbar(im, ax=ax_corr, fraction=0.046, pad=0.04)
+    fig.colorbar(im, ax=ax_corr, fraction=0.046, pad=0.04)
+
+    fig.tight_layout()
+    return fig, sc, titles, levels, labels, im, threading.Lock()
 
-    plt.tight_layout()
-    st.pyplot(fig)
+@st.cache_data(max_entries=128, ttl=3600)
+def _render_png(jx, jy):
+    fig, sc, titles, levels, labels, im, lock = _make_fig()
+    top_configs, probs = get_ranked_configs(jx, jy)
+
+    J_abs = abs(jx) + abs(jy)
+    E0 = - J_abs * 9 * 0.73
+    offsets = np.array([0, 0.18, 0.45, 0.72, 1.0, 1.4])
+    degen = [1, 3, 5, 1, 3, 7]
+    vals = E0 + offsets * J_abs
+
+    corr_matrix = 0.25 * sign_pattern(jx, jy)
+
+    with lock:
+        sc.set_facecolor(_SPIN_RGBA[(top_configs.ravel() + 1) >> 1])
+        for i, title in enumerate(titles):
+            title.set_text(f"Rank {i+1}\nProb: {probs[i]:.2f}%")
+
+        for k, val in enumerate(vals):
+            levels[k].set_ydata([val, val])
+            labels[k].set_y(val + 0.03)
+            labels[k].set_text(f"{val:.3f}\ng={degen[k]}")
+        # The levels are sorted, so set the autoscale limits (5% margins) directly
+        # instead of walking every artist with relim()
+        pad = 0.05 * (vals[-1] - vals[0]) or 0.1
+        levels[0].axes.set_ylim(vals[0] - pad, vals[-1] + pad)
+
+        im.set_data(corr_matrix)
+        # st.pyplot always rasterises at dpi=200; render at screen resolution instead.
+        # tight_layout already trims the margins, so skip the extra bbox_inches='tight' draw.
+        buf = io.BytesIO()
+        fig.savefig(buf, format='png', dpi=80)
+    return buf.getvalue()
+
+def run_app():
+    # Round so float noise from the 0.1-step sliders maps onto one cache key
+    st.image(_render_png(round(jx, 1), round(jy, 1)), width="stretch")
 
 if __name__ == "__main__":
     run_app()
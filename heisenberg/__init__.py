@@ -0,0 +1 @@
+from heisenberg.core import get_ranked_configs, sign_pattern
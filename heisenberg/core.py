@@ -0,0 +1,109 @@
+# Physics kernels for the 6x6 Heisenberg visualizer. Streamlit re-executes the
+# app script on every rerun, but this module is imported once per process, so
+# the compiled kernels, lookup tables and the st.cache_data entry are shared
+# by every rerun, session and entry point.
+import streamlit as st
+import numpy as np
+from numba import njit
+
+# A configuration is a 36-bit board: bit 6*r + c is set for an up spin at (r, c).
+_ONE = np.uint64(1)
+_FULL = np.uint64((1 << 36) - 1)
+_LAST_COL = np.uint64(sum(1 << (6*r + 5) for r in range(6)))
+_M1 = np.uint64(0x5555555555555555)
+_M2 = np.uint64(0x3333333333333333)
+_M4 = np.uint64(0x0F0F0F0F0F0F0F0F)
+_H01 = np.uint64(0x0101010101010101)
+
+# Explicit signatures compile eagerly at import and, with cache=True, are
+# loaded from __pycache__ on later worker starts instead of re-JIT-ing.
+@njit('uint64(uint64)', cache=True)
+def _popcount(x):
+    # SWAR bit count; LLVM lowers this to a single POPCNT
+    x = x - ((x >> _ONE) & _M1)
+    x = (x & _M2) + ((x >> np.uint64(2)) & _M2)
+    x = (x + (x >> np.uint64(4))) & _M4
+    return (x * _H01) >> np.uint64(56)
+
+@njit('float64(uint64, float64, float64)', cache=True)
+def _energy(bits, Jx, Jy):
+    # Neighbour boards under PBC: right = (r, c+1), down = (r+1, c)
+    right = ((bits >> _ONE) & ~_LAST_COL) | ((bits << np.uint64(5)) & _LAST_COL)
+    down = ((bits >> np.uint64(6)) | (bits << np.uint64(30))) & _FULL
+    dx = np.int64(_popcount(bits ^ right))
+    dy = np.int64(_popcount(bits ^ down))
+    return Jx * (36 - 2*dx) + Jy * (36 - 2*dy)
+
+_SITE_SHIFTS = np.arange(36, dtype=np.uint64)
+
+def _unpack(boards):
+    # Bit k of each board -> +1/-1 at (k // 6, k % 6), for all boards at once
+    bits = (boards[:, None] >> _SITE_SHIFTS) & _ONE
+    return (2 * bits.astype(np.int8) - 1).reshape(-1, 6, 6)
+
+def _sign_patterns():
+    # Classical sign of each site relative to (0, 0): alternates along every
+    # antiferromagnetic (J > 0) axis, uniform along ferromagnetic ones.
+    # Indexed as [Jx > 0, Jy > 0]; (-1)**k only depends on the parity of k.
+    alternating = np.where(np.arange(6) & 1, -1, 1).astype(np.int8)
+    uniform = np.ones(6, dtype=np.int8)
+    table = np.empty((2, 2, 6, 6), dtype=np.int8)
+    for afm_x, cols in enumerate((uniform, alternating)):
+        for afm_y, rows in enumerate((uniform, alternating)):
+            table[afm_x, afm_y] = np.outer(rows, cols)
+    table.flags.writeable = False
+    return table
+
+_SIGN_PATTERNS = _sign_patterns()
+
+def sign_pattern(Jx, Jy):
+    return _SIGN_PATTERNS[int(Jx > 0), int(Jy > 0)]
+
+def _pack(pattern):
+    # +1/-1 grid -> board with bit 6*r + c set for the up spins
+    return np.bitwise_or.reduce(_ONE << _SITE_SHIFTS[pattern.ravel() > 0])
+
+# Exact Sz = 0 minima of the classical energy, which depend only on the
+# coupling signs. Any antiferromagnetic axis is satisfied by alternating along
+# it (18 up spins on a 6x6 torus). With both axes ferromagnetic, the uniform
+# state is outside Sz = 0; the best is two 3-wide slabs whose two walls cut
+# the weaker bonds: rows for |Jy| <= |Jx|, columns otherwise.
+_NEEL_BOARDS = np.array([[_pack(p) for p in row] for row in _SIGN_PATTERNS])
+_ROW_SLAB = _pack(np.repeat(np.array([1, -1]), 18))
+_COL_SLAB = _pack(np.tile(np.repeat(np.array([1, -1]), 3), 6))
+
+def _ground_state(Jx, Jy):
+    if Jx > 0 or Jy > 0:
+        return _NEEL_BOARDS[int(Jx > 0), int(Jy > 0)]
+    return _ROW_SLAB if abs(Jy) <= abs(Jx) else _COL_SLAB
+
+# Lower-triangular mask: row i keeps the first i + 1 flip pairs
+_FLIP_PREFIX = np.tri(5, dtype=bool)
+
+@st.cache_data(max_entries=512, ttl=3600)
+def get_ranked_configs(Jx, Jy):
+    # Rank 1 is the exact classical ground state in the Sz = 0 sector
+    best = _ground_state(Jx, Jy)
+
+    # Ranks 2-6 are excitations of it: flipping i up/down pairs keeps Sz = 0
+    up_bits = (best >> _SITE_SHIFTS) & _ONE
+    up, down = np.flatnonzero(up_bits), np.flatnonzero(up_bits == 0)
+    # One independent shuffle per rank, drawn in a single call per spin
+    # direction; rank i + 1 flips the first i sites of its row
+    rng = np.random.default_rng(0)
+    ups = rng.permuted(np.tile(up, (5, 1)), axis=1)[:, :5]
+    downs = rng.permuted(np.tile(down, (5, 1)), axis=1)[:, :5]
+    pair_bits = (_ONE << _SITE_SHIFTS[ups]) | (_ONE << _SITE_SHIFTS[downs])
+    flips = np.where(_FLIP_PREFIX, pair_bits, 0)
+    candidates = np.concatenate(([best], best ^ np.bitwise_or.reduce(flips, axis=1)))
+    energies = np.array([_energy(b, Jx, Jy) for b in candidates])
+
+    indices = np.argsort(energies, kind='stable')
+    top_energies = energies[indices]
+    top_configs = _unpack(candidates[indices])
+    
+    beta = 0.5 
+    weights = np.exp(-beta * (top_energies - np.min(top_energies)))
+    probs = (weights / np.sum(weights)) * 100
+    
+    return top_configs, probs